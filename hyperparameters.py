@@ -5,5 +5,13 @@ HYPERPARAMETERS: dict[str, int | float] = {
     'EMBEDDING_SIZE': 128,
     'BATCH_SIZE': 64,
     'LSTM_HIDDEN_STATE_SIZE': 128,
-    'TEMPERATURE': 0.3
+    'TEMPERATURE': 0.3,
+    # note: a bloom filter drops a unique window as a duplicate with probability p; for n expected windows use m ≈ -n * ln(p) / ln(2)^2 bits and k ≈ m / n * ln(2) hashes
+    # e.g. 2^27 bits and 7 hashes keep p below 1e-5 up to ~4M windows, while 10M windows already give ~2e-3 and would need m = 2^28, k = 13 for 1e-4
+    'DEDUPLICATION_BLOOM_FILTER_SIZE': 2 ** 27,
+    'DEDUPLICATION_BLOOM_FILTER_NUMBER_OF_HASHES': 7,
+    'MINHASH_NUMBER_OF_PERMUTATIONS': 128,
+    'MINHASH_SHINGLE_SIZE': 3,
+    'LSH_NUMBER_OF_BANDS': 32,
+    'NEAR_DUPLICATE_THRESHOLD': 0.7
 }
\ No newline at end of file
@@ -8,19 +8,30 @@ from src.Vocabulary import Vocabulary
 from src.Dataset import Dataset
 from src.NeuralNetwork import NeuralNetwork
 from src.NextTokenPredictor import NextTokenPredictor
-from src.utils import test, demonstrate_examples
+from src.Deduplicator import Deduplicator
+from src.utils import test, demonstrate_examples, benchmark_incremental_preprocessing, report_deduplication
 
 if __name__ == "__main__":    
     parser = argparse.ArgumentParser()
     parser.add_argument('--train', action='store_true', help='If passed, the neural network will be trained')
     parser.add_argument('--test', action='store_true', help='If passed, the neural network will be evaluated on the test set')
     parser.add_argument('--demonstrate', action='store_true', help='If passed, the neural network will be used to demonstrate some examples of code autocompletion')
+    parser.add_argument('--benchmark', action='store_true', help='If passed, incremental preprocessing of an open file will be benchmarked on keystroke replays')
+    parser.add_argument('--no-deduplication', action='store_true', help='If passed, duplicate and near-duplicate training examples will be kept')
     args = parser.parse_args()
 
-    train_data = Data(folder=os.path.join('dataset', 'train'))
+    if args.benchmark:
+        benchmark_incremental_preprocessing()
+
+    # note: only the training set is deduplicated so that val and test perplexities stay comparable between runs
+    deduplicator = None if args.no_deduplication else Deduplicator()
+    train_data = Data(folder=os.path.join('dataset', 'train'), deduplicator=deduplicator)
     val_data = Data(folder=os.path.join('dataset', 'val'))
     test_data = Data(folder=os.path.join('dataset', 'test'))
 
+    if deduplicator:
+        report_deduplication(deduplicator)
+
     vocabulary = Vocabulary(train_data)
     vocabulary.save()
 
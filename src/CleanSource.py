@@ -0,0 +1,203 @@
+import numpy as np
+
+# note: (length, content start, content end, has comment, import flags) of a line in bytes, see _describe_line
+Line = tuple[int, int, int, bool, tuple[bool, bool, bool, bool]]
+
+# note: (start, end, is line break kept) of the part of a line that is kept in the clean source
+KeptLine = tuple[int, int, bool]
+
+class CleanSource:
+    IMPORT = 'import'
+
+    def __init__(self, source: bytes) -> None:
+        # note: keeps the source exactly as TextPreprocessor.clear_comments and TextPreprocessor.clear_imports would clean it,
+        # line by line, so that an edit of the source only cleans the lines around it again
+        self.source = source
+        self.lines: list[Line] = [self._describe_line(line) for line in source.split(b'\n')]
+        self.line_start_bytes: np.ndarray = self._accumulate([line[0] + 1 for line in self.lines[:-1]], 0)
+
+        self.first_content_line_idx, self.last_content_line_idx = self._find_content_lines(0, len(self.lines) - 1, None, None)
+        self.first_clean_line_idx, self.last_clean_line_idx = self._find_clean_lines()
+
+        self.kept_lines: list[KeptLine] = [self._keep_line(idx) for idx in range(0, len(self.lines))]
+        clean_lines = [self._make_clean_line(idx) for idx in range(0, len(self.lines))]
+        self.clean_line_start_bytes: np.ndarray = self._accumulate([len(clean_line) for clean_line in clean_lines[:-1]], 0)
+        self.clean_source: bytes = b''.join(clean_lines)
+
+    def edit(self, start_byte: int, old_end_byte: int, new_bytes: bytes) -> tuple[int, int, bytes]:
+        # note: returns the same edit applied to the clean source as (start byte, old end byte, new bytes)
+        first_line_idx = self._find_line(start_byte)
+        old_last_line_idx = self._find_line(old_end_byte)
+        line_start_byte = int(self.line_start_bytes[first_line_idx])
+        old_line_end_byte = int(self.line_start_bytes[old_last_line_idx]) + self.lines[old_last_line_idx][0]
+        new_line_end_byte = old_line_end_byte + len(new_bytes) - (old_end_byte - start_byte)
+
+        self.source = self.source[:start_byte] + new_bytes + self.source[old_end_byte:]
+        new_lines = [self._describe_line(line) for line in self.source[line_start_byte:new_line_end_byte].split(b'\n')]
+        new_last_line_idx = first_line_idx + len(new_lines) - 1
+        line_delta = new_last_line_idx - old_last_line_idx
+
+        old_bounds = [
+            idx if idx is None or idx < first_line_idx else (idx + line_delta if idx > old_last_line_idx else first_line_idx)
+            for idx in [self.first_content_line_idx, self.last_content_line_idx, self.first_clean_line_idx, self.last_clean_line_idx]
+        ]
+
+        # note: edited lines take the clean start byte of the first edited line until they are cleaned again below
+        self.lines[first_line_idx:old_last_line_idx + 1] = new_lines
+        self.kept_lines[first_line_idx:old_last_line_idx + 1] = [(0, 0, False)] * len(new_lines)
+        self.line_start_bytes = np.concatenate([
+            self.line_start_bytes[:first_line_idx],
+            self._accumulate([line[0] + 1 for line in new_lines[:-1]], line_start_byte),
+            self.line_start_bytes[old_last_line_idx + 1:] + (new_line_end_byte - old_line_end_byte),
+        ])
+        self.clean_line_start_bytes = np.concatenate([
+            self.clean_line_start_bytes[:first_line_idx],
+            np.full(len(new_lines), self.clean_line_start_bytes[first_line_idx], dtype=np.int64),
+            self.clean_line_start_bytes[old_last_line_idx + 1:],
+        ])
+
+        self.first_content_line_idx, self.last_content_line_idx = self._find_content_lines(first_line_idx, new_last_line_idx, old_bounds[0], old_bounds[1])
+        self.first_clean_line_idx, self.last_clean_line_idx = self._find_clean_lines()
+        new_bounds = [self.first_content_line_idx, self.last_content_line_idx, self.first_clean_line_idx, self.last_clean_line_idx]
+
+        # note: a line depends on the next line that is not blank and on the first and the last lines with content,
+        # so the lines up to the previous line that is not blank and the lines of the changed bounds are cleaned again as well
+        first_changed_line_idx = first_line_idx
+        while first_changed_line_idx > 0 and self._is_blank(first_changed_line_idx - 1):
+            first_changed_line_idx -= 1
+        first_changed_line_idx = max(first_changed_line_idx - 1, 0)
+        last_changed_line_idx = new_last_line_idx
+
+        for old_bound, new_bound in zip(old_bounds, new_bounds):
+            if old_bound == new_bound:
+                continue
+
+            for bound in [old_bound, new_bound]:
+                if bound is not None:
+                    first_changed_line_idx = min(first_changed_line_idx, bound)
+                    last_changed_line_idx = max(last_changed_line_idx, bound)
+
+        clean_start_byte = int(self.clean_line_start_bytes[first_changed_line_idx])
+        old_clean_end_byte = int(self.clean_line_start_bytes[last_changed_line_idx + 1]) if last_changed_line_idx + 1 < len(self.lines) else len(self.clean_source)
+
+        clean_lines: list[bytes] = []
+        clean_byte = clean_start_byte
+        for idx in range(first_changed_line_idx, last_changed_line_idx + 1):
+            self.kept_lines[idx] = self._keep_line(idx)
+            self.clean_line_start_bytes[idx] = clean_byte
+            clean_lines.append(self._make_clean_line(idx))
+            clean_byte += len(clean_lines[-1])
+
+        new_clean_bytes = b''.join(clean_lines)
+        self.clean_line_start_bytes[last_changed_line_idx + 1:] += clean_byte - old_clean_end_byte
+        self.clean_source = self.clean_source[:clean_start_byte] + new_clean_bytes + self.clean_source[old_clean_end_byte:]
+
+        return clean_start_byte, old_clean_end_byte, new_clean_bytes
+
+    def to_clean_byte(self, byte_idx: int) -> int:
+        # note: bytes that are cleaned out are mapped to the end of the kept part of their line
+        idx = self._find_line(byte_idx)
+        start, end, _ = self.kept_lines[idx]
+        column = byte_idx - int(self.line_start_bytes[idx])
+        return int(self.clean_line_start_bytes[idx]) + min(max(column - start, 0), end - start)
+
+    def _find_line(self, byte_idx: int) -> int:
+        return int(np.searchsorted(self.line_start_bytes, byte_idx, side='right')) - 1
+
+    def _find_content_lines(self, first_line_idx: int, last_line_idx: int, first_content_line_idx: int | None, last_content_line_idx: int | None) -> tuple[int | None, int | None]:
+        # note: the bounds outside of the given lines are kept, the lines before and after them are searched otherwise
+        if first_content_line_idx is None or first_content_line_idx >= first_line_idx:
+            first_content_line_idx = next((idx for idx in range(first_line_idx, len(self.lines)) if self._has_content(idx)), None)
+
+        if last_content_line_idx is None or last_content_line_idx <= last_line_idx:
+            last_content_line_idx = next((idx for idx in range(last_line_idx, -1, -1) if self._has_content(idx)), None)
+
+        return first_content_line_idx, last_content_line_idx
+
+    def _find_clean_lines(self) -> tuple[int | None, int | None]:
+        # note: the clean source starts and ends with the first and the last lines with content that are not imports
+        if self.first_content_line_idx is None or self.last_content_line_idx is None:
+            return None, None
+
+        first_clean_line_idx = self.first_content_line_idx
+        while first_clean_line_idx <= self.last_content_line_idx and not self._has_clean_content(first_clean_line_idx):
+            first_clean_line_idx += 1
+
+        if first_clean_line_idx > self.last_content_line_idx:
+            return None, None
+
+        last_clean_line_idx = self.last_content_line_idx
+        while not self._has_clean_content(last_clean_line_idx):
+            last_clean_line_idx -= 1
+
+        return first_clean_line_idx, last_clean_line_idx
+
+    def _keep_line(self, idx: int) -> KeptLine:
+        if self.first_clean_line_idx is None or self.last_clean_line_idx is None \
+            or idx < self.first_clean_line_idx or idx > self.last_clean_line_idx:
+            return 0, 0, False
+
+        length, content_start, content_end, has_comment, _ = self.lines[idx]
+        is_next_line_comment = self._is_next_line_comment(idx)
+        is_line_break_kept = idx < self.last_clean_line_idx and not is_next_line_comment
+
+        if self._is_import(idx, is_next_line_comment):
+            return 0, 0, is_line_break_kept
+
+        # note: whitespace in front of a comment is removed together with the comment, even across line breaks
+        start = content_start if idx == self.first_clean_line_idx else 0
+        end = content_end if has_comment or is_next_line_comment or idx == self.last_clean_line_idx else length
+        return start, end, is_line_break_kept
+
+    def _make_clean_line(self, idx: int) -> bytes:
+        start, end, is_line_break_kept = self.kept_lines[idx]
+        line_start_byte = int(self.line_start_bytes[idx])
+        return self.source[line_start_byte + start:line_start_byte + end] + (b'\n' if is_line_break_kept else b'')
+
+    def _has_clean_content(self, idx: int) -> bool:
+        return self._has_content(idx) and not self._is_import(idx, self._is_next_line_comment(idx))
+
+    def _is_import(self, idx: int, is_next_line_comment: bool) -> bool:
+        # note: an import is matched on the text without comments, which starts at the content of its first line and ends at the content of its last line
+        has_comment, import_flags = self.lines[idx][3:]
+        is_first = idx == self.first_content_line_idx
+        is_right_stripped = has_comment or is_next_line_comment or idx == self.last_content_line_idx
+        return import_flags[2 * int(is_first) + int(is_right_stripped)]
+
+    def _is_next_line_comment(self, idx: int) -> bool:
+        idx += 1
+        while idx < len(self.lines) and self._is_blank(idx):
+            idx += 1
+
+        return idx < len(self.lines) and self._is_comment_only(idx)
+
+    def _has_content(self, idx: int) -> bool:
+        return self.lines[idx][1] >= 0
+
+    def _is_blank(self, idx: int) -> bool:
+        return self.lines[idx][1] < 0 and not self.lines[idx][3]
+
+    def _is_comment_only(self, idx: int) -> bool:
+        return self.lines[idx][1] < 0 and self.lines[idx][3]
+
+    @staticmethod
+    def _describe_line(line: bytes) -> Line:
+        text = line.decode()
+        comment_start = text.find('//')
+        code = text[:comment_start] if comment_start >= 0 else text
+
+        left_stripped_code = code.lstrip()
+        right_stripped_code = code.rstrip()
+        content_start = len(code[:len(code) - len(left_stripped_code)].encode()) if len(left_stripped_code) > 0 else -1
+
+        # note: whether the line is an import when it is the first line with content and when its trailing whitespace is removed
+        import_flags = tuple(
+            kept_code.startswith(CleanSource.IMPORT) and len(kept_code) > len(CleanSource.IMPORT)
+            for kept_code in [code, right_stripped_code, left_stripped_code, right_stripped_code.lstrip()]
+        )
+
+        return len(line), content_start, len(right_stripped_code.encode()), comment_start >= 0, import_flags
+
+    @staticmethod
+    def _accumulate(lengths: list[int], start_byte: int) -> np.ndarray:
+        return start_byte + np.cumsum([0] + lengths, dtype=np.int64)
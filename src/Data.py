@@ -1,14 +1,18 @@
 import os
+import typing
 from hyperparameters import HYPERPARAMETERS
 from src.TextPreprocessor import TextPreprocessor
+from src.Deduplicator import Deduplicator
 
 class Data:
-    def __init__(self, folder: str | None = None, inputs: list[list[str]] | None = None, targets: list[str] | None = None) -> None:
+    def __init__(self, folder: str | None = None, inputs: list[list[str]] | None = None, targets: list[str] | None = None, deduplicator: Deduplicator | None = None) -> None:
+        self.deduplicator = deduplicator
+
         self.inputs: list[list[str]] = inputs if inputs else []
         self.targets: list[str] = targets if targets else []
 
         if folder:
-            for filename in os.listdir(folder):
+            for filename in sorted(os.listdir(folder)):
                 self._extract_inputs_and_targets_from_file(folder, filename)
 
     def __len__(self) -> int:
@@ -22,17 +26,33 @@ class Data:
             text = file.read()
             tokens = TextPreprocessor.tokenize(text)
 
-            number_of_tokens = len(tokens)
-            last_token_idx = number_of_tokens - 1
+            is_near_duplicate_file = self.deduplicator is not None and self.deduplicator.is_near_duplicate_file(tokens)
+            number_of_examples = 0
+            number_of_exact_duplicates = 0
+
+            for input, target in self._slide_window(tokens):
+                number_of_examples += 1
 
-            for i in range(0, number_of_tokens):
-                target_idx = min(i + HYPERPARAMETERS["SEQUENCE_LENGTH"], last_token_idx)
+                if is_near_duplicate_file:
+                    continue
 
-                input = tokens[i:target_idx]
-                target = tokens[target_idx]
+                if self.deduplicator and self.deduplicator.is_duplicate_example(input, target):
+                    number_of_exact_duplicates += 1
+                    continue
 
                 self.inputs.append(input)
                 self.targets.append(target)
 
-                if target_idx == last_token_idx:
-                    break
\ No newline at end of file
+            if self.deduplicator:
+                self.deduplicator.record_file(number_of_examples, number_of_exact_duplicates, is_near_duplicate_file)
+
+    def _slide_window(self, tokens: list[str]) -> typing.Iterator[tuple[list[str], str]]:
+        number_of_tokens = len(tokens)
+        last_token_idx = number_of_tokens - 1
+
+        for i in range(0, number_of_tokens):
+            target_idx = min(i + HYPERPARAMETERS["SEQUENCE_LENGTH"], last_token_idx)
+            yield tokens[i:target_idx], tokens[target_idx]
+
+            if target_idx == last_token_idx:
+                break
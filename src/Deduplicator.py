@@ -0,0 +1,96 @@
+import hashlib
+import math
+import numpy as np
+from hyperparameters import HYPERPARAMETERS
+
+class Deduplicator:
+    MERSENNE_PRIME = (1 << 61) - 1
+    MAX_HASH = (1 << 32) - 1
+
+    def __init__(self) -> None:
+        self.bloom_filter_size = int(HYPERPARAMETERS['DEDUPLICATION_BLOOM_FILTER_SIZE'])
+        self.bloom_filter_number_of_hashes = int(HYPERPARAMETERS['DEDUPLICATION_BLOOM_FILTER_NUMBER_OF_HASHES'])
+        self.number_of_permutations = int(HYPERPARAMETERS['MINHASH_NUMBER_OF_PERMUTATIONS'])
+        self.shingle_size = int(HYPERPARAMETERS['MINHASH_SHINGLE_SIZE'])
+        self.number_of_bands = int(HYPERPARAMETERS['LSH_NUMBER_OF_BANDS'])
+        self.near_duplicate_threshold = float(HYPERPARAMETERS['NEAR_DUPLICATE_THRESHOLD'])
+
+        assert self.number_of_permutations % self.number_of_bands == 0, 'number of permutations must be divisible by number of bands'
+        self.rows_per_band = self.number_of_permutations // self.number_of_bands
+
+        # note: a bloom filter keeps memory bounded regardless of the number of windows, at the cost of rare false positives
+        self.bloom_filter = bytearray(self.bloom_filter_size // 8 + 1)
+
+        generator = np.random.default_rng(seed=0)
+        self.permutation_multipliers = generator.integers(1, Deduplicator.MAX_HASH, size=self.number_of_permutations, dtype=np.uint64)
+        self.permutation_offsets = generator.integers(0, Deduplicator.MAX_HASH, size=self.number_of_permutations, dtype=np.uint64)
+
+        self.band_to_bucket_to_file_idxs: list[dict[bytes, list[int]]] = [{} for _ in range(0, self.number_of_bands)]
+        self.signatures: list[np.ndarray] = []
+
+        self.number_of_examples = 0
+        self.number_of_exact_duplicates = 0
+        self.number_of_files = 0
+        self.number_of_near_duplicate_files = 0
+        self.number_of_near_duplicate_examples = 0
+
+    def is_duplicate_example(self, input: list[str], target: str) -> bool:
+        digest = hashlib.blake2b('\0'.join(input + [target]).encode(), digest_size=16).digest()
+        first_hash = int.from_bytes(digest[:8], 'little')
+        second_hash = int.from_bytes(digest[8:], 'little') | 1
+
+        is_duplicate = True
+        for i in range(0, self.bloom_filter_number_of_hashes):
+            bit_idx = (first_hash + i * second_hash) % self.bloom_filter_size
+            byte_idx, bit_mask = bit_idx >> 3, 1 << (bit_idx & 7)
+
+            if not self.bloom_filter[byte_idx] & bit_mask:
+                is_duplicate = False
+                self.bloom_filter[byte_idx] |= bit_mask
+
+        return is_duplicate
+
+    def calculate_false_positive_rate(self) -> float:
+        # note: expected share of new examples that the bloom filter reports as duplicates, (1 - e^(-k * n / m))^k
+        number_of_inserted_examples = self.number_of_examples - self.number_of_near_duplicate_examples
+        return (1 - math.exp(-self.bloom_filter_number_of_hashes * number_of_inserted_examples / self.bloom_filter_size)) ** self.bloom_filter_number_of_hashes
+
+    def is_near_duplicate_file(self, tokens: list[str]) -> bool:
+        signature = self._calculate_signature(tokens)
+        band_keys = [signature[band * self.rows_per_band:(band + 1) * self.rows_per_band].tobytes() for band in range(0, self.number_of_bands)]
+
+        candidate_file_idxs: set[int] = set()
+        for band, band_key in enumerate(band_keys):
+            candidate_file_idxs.update(self.band_to_bucket_to_file_idxs[band].get(band_key, []))
+
+        for file_idx in candidate_file_idxs:
+            estimated_similarity = float(np.mean(self.signatures[file_idx] == signature))
+            if estimated_similarity >= self.near_duplicate_threshold:
+                return True
+
+        file_idx = len(self.signatures)
+        self.signatures.append(signature)
+        for band, band_key in enumerate(band_keys):
+            self.band_to_bucket_to_file_idxs[band].setdefault(band_key, []).append(file_idx)
+
+        return False
+
+    def record_file(self, number_of_examples: int, number_of_exact_duplicates: int, is_near_duplicate: bool) -> None:
+        self.number_of_files += 1
+        self.number_of_examples += number_of_examples
+        self.number_of_exact_duplicates += number_of_exact_duplicates
+
+        if is_near_duplicate:
+            self.number_of_near_duplicate_files += 1
+            self.number_of_near_duplicate_examples += number_of_examples
+
+    def _calculate_signature(self, tokens: list[str]) -> np.ndarray:
+        number_of_shingles = max(len(tokens) - self.shingle_size + 1, 1)
+        shingle_hashes = np.array([
+            int.from_bytes(hashlib.blake2b('\0'.join(tokens[i:i + self.shingle_size]).encode(), digest_size=4).digest(), 'little')
+            for i in range(0, number_of_shingles)
+        ], dtype=np.uint64)
+
+        # note: a * h + b does not overflow uint64 because a, b and h are all below 2^32
+        permuted_hashes = (np.outer(shingle_hashes, self.permutation_multipliers) + self.permutation_offsets) % np.uint64(Deduplicator.MERSENNE_PRIME)
+        return permuted_hashes.min(axis=0)
@@ -0,0 +1,548 @@
+import bisect
+import typing
+import numpy as np
+from tree_sitter import Parser, Node, Tree, TreeCursor
+from src.TextPreprocessor import TextPreprocessor, Piece, TokenizedPiece, BlockState
+from src.CleanSource import CleanSource
+
+# note: (is processing string, string chars, name chars) carried into a segment from the segments before it, see _emit_tokens
+TokenState = tuple[bool, str, str]
+
+class Document:
+    def __init__(self, text: str) -> None:
+        self.parser = Parser()
+        self.parser.set_language(TextPreprocessor.load_typescript_language())
+
+        # note: the clean source is the source without comments and imports, the same text that TextPreprocessor.tokenize normalizes
+        self.source: bytes = bytes(text, 'utf8')
+        self.clean = CleanSource(self.source)
+        self.clean_source: bytes = self.clean.clean_source
+        self.tree: Tree = self.parser.parse(self.clean_source)
+
+        # note: the block scan is kept per line, so that an edit only scans the lines from the edited one until the scan is back in step,
+        # see TextPreprocessor.scan_blocks; block ends are kept as distances to the start of their line
+        self.block_line_start_bytes: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.block_line_states: list[BlockState] = []
+        self.block_line_ends: list[list[int]] = []
+        self.lone_backtick_bytes: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.number_of_unclosed_block_ends = 0
+        self._scan_blocks(0, 0, 0)
+
+        # note: when blocks are left unclosed, the clean source with virtual closing braces is parsed instead, see TextPreprocessor.close_unclosed_blocks
+        self.recovered_source: bytes | None = None
+        self.recovered_tree: Tree | None = None
+
+        # note: the clean source is split into segments at the top-level nodes, every segment keeps its pieces relative to its start,
+        # the tokenized pieces and the token state it starts with, so that an edit only splits and tokenizes the segments around it again
+        self.segment_start_bytes: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.segment_keys: list[tuple] = []
+        self.segment_pieces: list[list[Piece]] = []
+        self.segment_caches: list[dict[tuple, typing.Any]] = []
+        self.segment_tokenized_pieces: list[list[TokenizedPiece]] = []
+        self.segment_token_states: list[TokenState] = []
+        self.segment_is_next_text_char_digit: list[bool] = []
+        self.segment_token_start_idxs: np.ndarray = np.zeros(1, dtype=np.int64)
+        self.tokens: list[str] = []
+
+        if self.tree.root_node.has_error and self.number_of_unclosed_block_ends > 0:
+            self.recovered_source = TextPreprocessor.close_unclosed_blocks(self.clean_source)
+            self.recovered_tree = self.parser.parse(self.recovered_source)
+
+        self._update_segments(0, 0, 0, [(0, len(self.clean_source))])
+
+    @property
+    def text(self) -> str:
+        return self.source.decode()
+
+    def edit(self, start_byte: int, old_end_byte: int, new_text: str) -> None:
+        new_text_bytes = bytes(new_text, 'utf8')
+        self.source = self.source[:start_byte] + new_text_bytes + self.source[old_end_byte:]
+        self._edit_clean_source(*self.clean.edit(start_byte, old_end_byte, new_text_bytes))
+
+    def insert(self, byte_idx: int, new_text: str) -> None:
+        self.edit(byte_idx, byte_idx, new_text)
+
+    def delete(self, start_byte: int, end_byte: int) -> None:
+        self.edit(start_byte, end_byte, '')
+
+    def tokens_before(self, byte_idx: int) -> list[str]:
+        byte_idx = self.clean.to_clean_byte(byte_idx)
+        segment_idx = int(np.searchsorted(self.segment_start_bytes, byte_idx, side='right')) - 1
+        if segment_idx < 0:
+            return []
+
+        segment_start_byte = int(self.segment_start_bytes[segment_idx])
+        pieces = self.segment_pieces[segment_idx]
+        tokenized_pieces = self.segment_tokenized_pieces[segment_idx]
+        piece_idx = bisect.bisect_right([piece[0] for piece in pieces], byte_idx - segment_start_byte) - 1
+
+        is_processing_string, string_chars, name_chars = self.segment_token_states[segment_idx]
+        if piece_idx > 0:
+            is_processing_string = tokenized_pieces[piece_idx - 1][4]
+
+        # note: the piece under the cursor is cut and normalized with the same replacements as the whole piece
+        start_byte, end_byte, text, replacements = pieces[piece_idx]
+        if segment_start_byte + end_byte > byte_idx:
+            text = TextPreprocessor.apply_replacements(self.clean_source[segment_start_byte + start_byte:byte_idx].decode(errors='ignore'), replacements)
+        tokenized_pieces = tokenized_pieces[:piece_idx] + [TextPreprocessor.tokenize_piece(text, is_processing_string)]
+
+        tokens = self.tokens[:self.segment_token_start_idxs[segment_idx]]
+        segment_tokens, (_, string_chars, name_chars) = self._emit_tokens(tokenized_pieces, self.segment_token_states[segment_idx])
+        return tokens + segment_tokens + self._flush_tokens(string_chars, name_chars)
+
+    def _edit_clean_source(self, start_byte: int, old_end_byte: int, new_bytes: bytes) -> None:
+        old_bytes = self.clean_source[start_byte:old_end_byte]
+
+        # note: the edit is narrowed to the bytes that have actually changed, so that the parser can reuse as much as possible
+        prefix_length = 0
+        max_prefix_length = min(len(old_bytes), len(new_bytes))
+        while prefix_length < max_prefix_length and old_bytes[prefix_length] == new_bytes[prefix_length]:
+            prefix_length += 1
+
+        suffix_length = 0
+        max_suffix_length = max_prefix_length - prefix_length
+        while suffix_length < max_suffix_length and old_bytes[-suffix_length - 1] == new_bytes[-suffix_length - 1]:
+            suffix_length += 1
+
+        edit_start_byte = start_byte + prefix_length
+        edit_old_end_byte = old_end_byte - suffix_length
+        edit_new_bytes = new_bytes[prefix_length:len(new_bytes) - suffix_length]
+        edit_new_end_byte = edit_start_byte + len(edit_new_bytes)
+
+        if edit_start_byte == edit_old_end_byte and len(edit_new_bytes) == 0:
+            return
+
+        old_clean_source = self.clean_source
+        self.clean_source = old_clean_source[:edit_start_byte] + edit_new_bytes + old_clean_source[edit_old_end_byte:]
+        self.tree, dirty_ranges = self._parse_edit(self.tree, old_clean_source, self.clean_source, edit_start_byte, edit_old_end_byte, edit_new_end_byte, self.recovered_tree is None)
+
+        are_block_ends_moved = self._scan_blocks(edit_start_byte, edit_old_end_byte, edit_new_end_byte)
+        is_recovered = self.tree.root_node.has_error and self.number_of_unclosed_block_ends > 0
+
+        if is_recovered and self.recovered_tree is not None and not are_block_ends_moved:
+            old_recovered_source = self.recovered_source
+            self.recovered_source = old_recovered_source[:edit_start_byte] + edit_new_bytes + old_recovered_source[edit_old_end_byte:]
+            self.recovered_tree, dirty_ranges = self._parse_edit(self.recovered_tree, old_recovered_source, self.recovered_source, edit_start_byte, edit_old_end_byte, edit_new_end_byte, True)
+        elif is_recovered:
+            # note: the incremental parse does not always match a fresh parse around moved virtual braces, so the recovered source is parsed from scratch then
+            self.recovered_source = TextPreprocessor.close_unclosed_blocks(self.clean_source)
+            self.recovered_tree = self.parser.parse(self.recovered_source)
+            dirty_ranges = [(0, len(self.clean_source))]
+        elif self.recovered_tree is not None:
+            self.recovered_source = None
+            self.recovered_tree = None
+            dirty_ranges = [(0, len(self.clean_source))]
+            if self.tree.root_node.has_error:
+                self.tree = self.parser.parse(self.clean_source)
+
+        self._update_segments(edit_start_byte, edit_old_end_byte, edit_new_end_byte, dirty_ranges)
+
+    def _parse_edit(self, tree: Tree, old_source: bytes, source: bytes, start_byte: int, old_end_byte: int, new_end_byte: int, is_tokenized: bool) -> tuple[Tree, list[tuple[int, int]]]:
+        # note: text with errors can be parsed differently depending on the tree it is parsed from and on the text after it,
+        # so a tokenized tree with errors is parsed from scratch, which keeps it the same as a fresh parse and costs about as much as reusing it;
+        # returns the tree with the ranges that have to be split and tokenized again
+        self._edit_tree(tree, old_source, source, start_byte, old_end_byte, new_end_byte)
+
+        new_tree = None
+        if not is_tokenized or not tree.root_node.has_error:
+            new_tree = self.parser.parse(source, tree)
+        if new_tree is None or is_tokenized and new_tree.root_node.has_error:
+            new_tree = self.parser.parse(source)
+
+        dirty_ranges = [(start_byte, new_end_byte)]
+        dirty_ranges.extend((changed_range.start_byte, changed_range.end_byte) for changed_range in tree.changed_ranges(new_tree))
+        return new_tree, dirty_ranges
+
+    def _scan_blocks(self, start_byte: int, old_end_byte: int, new_end_byte: int) -> bool:
+        # note: returns whether unclosed block ends have changed other than by moving together with the text after the edit;
+        # the scan is resumed in front of the edited line, or in front of a backtick without a closing backtick, which the edit could close,
+        # and stops at the first line after the edit that starts with the same open blocks as before the edit
+        delta = new_end_byte - old_end_byte
+        resume_limit = self.clean_source.rfind(b'\n', 0, start_byte) + 1
+        if len(self.lone_backtick_bytes) > 0 and self.lone_backtick_bytes[0] < start_byte:
+            resume_limit = min(resume_limit, int(self.lone_backtick_bytes[0]))
+
+        first_line_idx = int(np.searchsorted(self.block_line_start_bytes, resume_limit, side='right')) - 1
+        if first_line_idx >= 0:
+            resume_byte, state = int(self.block_line_start_bytes[first_line_idx]), self.block_line_states[first_line_idx]
+        else:
+            first_line_idx, resume_byte, state = 0, 0, (0, ())
+
+        old_last_line_idx = len(self.block_line_states) - 1
+        is_scan_in_step = False
+        line_start_bytes: list[int] = []
+        line_states: list[BlockState] = []
+        line_ends: list[list[int]] = []
+        lone_backtick_bytes: list[int] = []
+
+        for byte_idx, line_state, block_ends in TextPreprocessor.scan_blocks(self.clean_source, resume_byte, state):
+            if line_state is None:
+                lone_backtick_bytes.append(byte_idx)
+                continue
+
+            line_start_bytes.append(byte_idx)
+            line_states.append(line_state)
+            line_ends.append([byte_idx - block_end for block_end in block_ends])
+
+            if byte_idx >= new_end_byte:
+                old_line_idx = int(np.searchsorted(self.block_line_start_bytes, byte_idx - delta))
+                if old_line_idx < len(self.block_line_states) and self.block_line_start_bytes[old_line_idx] == byte_idx - delta \
+                    and self.block_line_states[old_line_idx][1] == line_state[1]:
+                    old_last_line_idx = old_line_idx
+                    is_scan_in_step = True
+                    break
+
+        old_block_ends: list[int] = []
+        are_block_ends_moved = False
+        for line_idx in range(first_line_idx, old_last_line_idx + 1):
+            for distance in self.block_line_ends[line_idx]:
+                block_end = int(self.block_line_start_bytes[line_idx]) - distance
+                are_block_ends_moved = are_block_ends_moved or start_byte <= block_end < old_end_byte
+                old_block_ends.append(block_end + delta if block_end >= old_end_byte else block_end)
+
+        new_block_ends = [line_start_byte - distance for line_start_byte, ends in zip(line_start_bytes, line_ends) for distance in ends]
+        are_block_ends_moved = are_block_ends_moved or old_block_ends != new_block_ends
+        self.number_of_unclosed_block_ends += len(new_block_ends) - len(old_block_ends)
+
+        old_lone_backtick_bytes = self.lone_backtick_bytes[:0]
+        if is_scan_in_step:
+            old_lone_backtick_bytes = self.lone_backtick_bytes[self.lone_backtick_bytes > self.block_line_start_bytes[old_last_line_idx]]
+
+        self.lone_backtick_bytes = np.concatenate([np.array(lone_backtick_bytes, dtype=np.int64), old_lone_backtick_bytes + delta])
+        self.block_line_start_bytes = np.concatenate([
+            self.block_line_start_bytes[:first_line_idx],
+            np.array(line_start_bytes, dtype=np.int64),
+            self.block_line_start_bytes[old_last_line_idx + 1:] + delta,
+        ])
+        self.block_line_states[first_line_idx:old_last_line_idx + 1] = line_states
+        self.block_line_ends[first_line_idx:old_last_line_idx + 1] = line_ends
+
+        return are_block_ends_moved
+
+    def _update_segments(self, start_byte: int, old_end_byte: int, new_end_byte: int, dirty_ranges: list[tuple[int, int]]) -> None:
+        if self.recovered_tree is not None:
+            tree, parsed_source = self.recovered_tree, self.recovered_source
+        else:
+            tree, parsed_source = self.tree, self.clean_source
+
+        # note: segments that start inside of the edit are moved to its start, so that the starts stay sorted
+        delta = new_end_byte - old_end_byte
+        old_start_bytes = self.segment_start_bytes
+        old_start_bytes = np.where(old_start_bytes >= old_end_byte, old_start_bytes + delta, np.minimum(old_start_bytes, start_byte))
+
+        # note: the dirty bytes are widened to the segments that touch them, until those start and end at the same bytes before and after the edit
+        root = tree.root_node
+        dirty_start_byte = max(min(start for start, _ in dirty_ranges) - 1, 0)
+        dirty_end_byte = max(end for _, end in dirty_ranges) + 1
+
+        while True:
+            new_segment_start_byte = self._find_segment_start(root, dirty_start_byte)
+            old_idx = int(np.searchsorted(old_start_bytes, dirty_start_byte, side='right')) - 1
+            old_segment_start_byte = int(old_start_bytes[old_idx]) if old_idx >= 0 else 0
+            dirty_start_byte = min(new_segment_start_byte, old_segment_start_byte)
+            if new_segment_start_byte == old_segment_start_byte:
+                break
+
+        while True:
+            new_segment_end_byte = self._find_segment_end(root, dirty_end_byte, len(self.clean_source))
+            old_idx = int(np.searchsorted(old_start_bytes, dirty_end_byte, side='left'))
+            old_segment_end_byte = int(old_start_bytes[old_idx]) if old_idx < len(old_start_bytes) else len(self.clean_source)
+            dirty_end_byte = max(new_segment_end_byte, old_segment_end_byte)
+            if new_segment_end_byte == old_segment_end_byte:
+                break
+
+        dirty_start_byte = min(dirty_start_byte, len(self.clean_source))
+        dirty_end_byte = min(dirty_end_byte, len(self.clean_source))
+        first_idx = int(np.searchsorted(old_start_bytes, dirty_start_byte, side='left'))
+        old_last_idx = int(np.searchsorted(old_start_bytes, dirty_end_byte, side='left')) if dirty_end_byte < len(self.clean_source) else len(old_start_bytes)
+
+        # note: the tokenized pieces of the previous segments are looked up by their text, so that an edited segment is mostly not tokenized again
+        text_to_tokenized_piece: dict[tuple[str, bool, bool], TokenizedPiece] = {}
+        for idx in range(first_idx, old_last_idx):
+            text_to_tokenized_piece.update(self._map_text_to_tokenized_piece(idx))
+
+        segment_start_bytes, segments = self._split_segments(root, parsed_source, dirty_start_byte, dirty_end_byte, first_idx, old_last_idx, old_start_bytes, dirty_ranges)
+        last_idx = first_idx + len(segments)
+
+        self.segment_start_bytes = np.concatenate([old_start_bytes[:first_idx], np.array(segment_start_bytes, dtype=np.int64), old_start_bytes[old_last_idx:]])
+        self.segment_token_start_idxs = np.concatenate([
+            self.segment_token_start_idxs[:first_idx],
+            np.zeros(len(segments), dtype=np.int64),
+            self.segment_token_start_idxs[old_last_idx:],
+        ])
+        for segment_field, values in zip(
+            [self.segment_keys, self.segment_pieces, self.segment_caches, self.segment_tokenized_pieces, self.segment_token_states, self.segment_is_next_text_char_digit],
+            zip(*segments) if len(segments) > 0 else [[]] * 6,
+        ):
+            segment_field[first_idx:old_last_idx] = values
+
+        self._update_tokens(max(first_idx - 1, 0), last_idx, text_to_tokenized_piece)
+
+    def _split_segments(
+        self,
+        root: Node,
+        parsed_source: bytes,
+        start_byte: int,
+        end_byte: int,
+        old_first_idx: int,
+        old_last_idx: int,
+        old_start_bytes: np.ndarray,
+        dirty_ranges: list[tuple[int, int]],
+    ) -> tuple[list[int], list[tuple]]:
+        # note: a segment is reused when a previous segment spans the same bytes outside of the dirty ranges, where neither the text nor the tree has changed,
+        # or when a previous or new segment without errors has the same key, or when a new segment with errors has the same key and structure,
+        # which is only compared on such a match; otherwise the members of the previous classes are reused
+        key_to_segment: dict[tuple, tuple] = {}
+        key_to_error_segments: dict[tuple, list[list]] = {}
+        previous_cache: dict[tuple, typing.Any] = {}
+        for idx in range(old_first_idx, old_last_idx):
+            if not self.segment_keys[idx][-1]:
+                key_to_segment[self.segment_keys[idx]] = self._get_segment(idx)
+            previous_cache.update(self.segment_caches[idx])
+
+        segment_start_bytes: list[int] = []
+        segment_nodes: list[list[Node]] = []
+
+        cursor = self._walk_to_top_level_node(root, start_byte)
+        is_node = cursor is not None
+        while is_node and cursor.node.start_byte < end_byte:
+            node = cursor.node
+            if len(segment_start_bytes) == 0 or node.start_byte > segment_start_bytes[-1]:
+                segment_start_bytes.append(node.start_byte if len(segment_start_bytes) > 0 else start_byte)
+                segment_nodes.append([])
+
+            segment_nodes[-1].append(node)
+            is_node = cursor.goto_next_sibling()
+
+        if len(segment_start_bytes) == 0 and end_byte > start_byte:
+            segment_start_bytes.append(start_byte)
+            segment_nodes.append([])
+
+        segments: list[tuple] = []
+        for idx, segment_start_byte in enumerate(segment_start_bytes):
+            segment_end_byte = segment_start_bytes[idx + 1] if idx + 1 < len(segment_start_bytes) else end_byte
+            nodes = segment_nodes[idx]
+
+            if not any(start <= segment_end_byte and segment_start_byte <= end for start, end in dirty_ranges):
+                old_idx = old_first_idx + int(np.searchsorted(old_start_bytes[old_first_idx:old_last_idx], segment_start_byte))
+                old_end_byte = int(old_start_bytes[old_idx + 1]) if old_idx + 1 < len(old_start_bytes) else len(self.clean_source)
+                if old_idx < old_last_idx and old_start_bytes[old_idx] == segment_start_byte and old_end_byte == segment_end_byte:
+                    segments.append(self._get_segment(old_idx))
+                    continue
+
+            is_error = any(node.has_error for node in nodes)
+            key = (
+                tuple(node.type for node in nodes),
+                parsed_source[segment_start_byte:segment_end_byte],
+                self.clean_source[segment_start_byte:segment_end_byte],
+                is_error,
+            )
+            if not is_error and key in key_to_segment:
+                segments.append(key_to_segment[key])
+                continue
+
+            # note: an entry holds the nodes of a segment with errors, their structure once it has been compared, and the segment
+            error_segments = key_to_error_segments.setdefault(key, []) if is_error else []
+            entry: list = [nodes, None, None]
+            for error_segment in error_segments:
+                error_segment[1] = error_segment[1] or [node.sexp() for node in error_segment[0]]
+                entry[1] = entry[1] or [node.sexp() for node in nodes]
+                if error_segment[1] == entry[1]:
+                    entry[2] = error_segment[2]
+                    break
+
+            if entry[2] is not None:
+                segments.append(entry[2])
+                continue
+
+            cache: dict[tuple, typing.Any] = {}
+            pieces: list[Piece] = []
+            position = segment_start_byte
+
+            for node in nodes:
+                if node.start_byte > position:
+                    pieces.append(TextPreprocessor.make_piece(self.clean_source, position, node.start_byte, []))
+
+                pieces.extend(TextPreprocessor.split_node_into_pieces(node, self.clean_source, (previous_cache, cache)))
+                position = max(position, node.end_byte)
+
+            if segment_end_byte > position:
+                pieces.append(TextPreprocessor.make_piece(self.clean_source, position, segment_end_byte, []))
+
+            entry[2] = (key, TextPreprocessor.shift_pieces(pieces, -segment_start_byte), cache, None, None, False)
+            if is_error:
+                error_segments.append(entry)
+            else:
+                key_to_segment[key] = entry[2]
+            segments.append(entry[2])
+
+        return segment_start_bytes, segments
+
+    def _get_segment(self, idx: int) -> tuple:
+        return (
+            self.segment_keys[idx],
+            self.segment_pieces[idx],
+            self.segment_caches[idx],
+            self.segment_tokenized_pieces[idx],
+            self.segment_token_states[idx],
+            self.segment_is_next_text_char_digit[idx],
+        )
+
+    def _update_tokens(self, first_idx: int, last_idx: int, text_to_tokenized_piece: dict[tuple[str, bool, bool], TokenizedPiece]) -> None:
+        # note: segments are tokenized from the first index on, and after the last index only until a segment starts with the same token state as before
+        token_state: TokenState = (False, '', '')
+        token_start_idx = 0
+        if first_idx > 0:
+            token_state = self.segment_token_states[first_idx]
+            token_start_idx = int(self.segment_token_start_idxs[first_idx])
+
+        tokens: list[str] = []
+        idx = first_idx
+
+        while idx < len(self.segment_pieces):
+            if idx >= last_idx and self.segment_token_states[idx] == token_state:
+                break
+
+            is_next_text_char_digit = (self._find_next_text_char(idx) or '').isdigit()
+            if self.segment_tokenized_pieces[idx] is None or self.segment_token_states[idx] is None \
+                or self.segment_token_states[idx][0] != token_state[0] or self.segment_is_next_text_char_digit[idx] != is_next_text_char_digit:
+                self.segment_tokenized_pieces[idx] = self._tokenize_pieces(self.segment_pieces[idx], token_state[0], is_next_text_char_digit, text_to_tokenized_piece)
+
+            self.segment_token_states[idx] = token_state
+            self.segment_is_next_text_char_digit[idx] = is_next_text_char_digit
+            self.segment_token_start_idxs[idx] = token_start_idx + len(tokens)
+
+            segment_tokens, token_state = self._emit_tokens(self.segment_tokenized_pieces[idx], token_state)
+            tokens.extend(segment_tokens)
+            idx += 1
+
+        if idx == len(self.segment_pieces):
+            self.segment_token_start_idxs[idx] = token_start_idx + len(tokens)
+            self.tokens[token_start_idx:] = tokens + self._flush_tokens(token_state[1], token_state[2])
+            return
+
+        old_token_end_idx = int(self.segment_token_start_idxs[idx])
+        self.tokens[token_start_idx:old_token_end_idx] = tokens
+        self.segment_token_start_idxs[idx:] += token_start_idx + len(tokens) - old_token_end_idx
+
+    def _map_text_to_tokenized_piece(self, idx: int) -> dict[tuple[str, bool, bool], TokenizedPiece]:
+        text_to_tokenized_piece: dict[tuple[str, bool, bool], TokenizedPiece] = {}
+        pieces = self.segment_pieces[idx]
+        is_processing_string = self.segment_token_states[idx][0]
+        is_next_text_char_digit = self._is_next_text_char_digit(pieces, self.segment_is_next_text_char_digit[idx])
+
+        for piece_idx, tokenized_piece in enumerate(self.segment_tokenized_pieces[idx]):
+            text_to_tokenized_piece[(pieces[piece_idx][2], is_processing_string, is_next_text_char_digit[piece_idx])] = tokenized_piece
+            is_processing_string = tokenized_piece[4]
+
+        return text_to_tokenized_piece
+
+    def _tokenize_pieces(self, pieces: list[Piece], is_processing_string: bool, is_last_next_text_char_digit: bool, text_to_tokenized_piece: dict[tuple[str, bool, bool], TokenizedPiece]) -> list[TokenizedPiece]:
+        # note: a piece is tokenized depending on whether it starts inside of a string and whether the next piece starts with a digit
+        is_next_text_char_digit = self._is_next_text_char_digit(pieces, is_last_next_text_char_digit)
+        tokenized_pieces: list[TokenizedPiece] = []
+
+        for idx, piece in enumerate(pieces):
+            key = (piece[2], is_processing_string, is_next_text_char_digit[idx])
+            tokenized_piece = text_to_tokenized_piece.get(key)
+            if tokenized_piece is None:
+                tokenized_piece = TextPreprocessor.tokenize_piece(piece[2], is_processing_string, '0' if is_next_text_char_digit[idx] else None)
+                text_to_tokenized_piece[key] = tokenized_piece
+
+            tokenized_pieces.append(tokenized_piece)
+            is_processing_string = tokenized_piece[4]
+
+        return tokenized_pieces
+
+    def _find_next_text_char(self, idx: int) -> str | None:
+        for pieces in self.segment_pieces[idx + 1:]:
+            for piece in pieces:
+                if len(piece[2]) > 0:
+                    return piece[2][0]
+
+        return None
+
+    @staticmethod
+    def _is_next_text_char_digit(pieces: list[Piece], is_last_next_text_char_digit: bool) -> list[bool]:
+        is_next_text_char_digit: list[bool] = [False] * len(pieces)
+        is_digit = is_last_next_text_char_digit
+        for idx in range(len(pieces) - 1, -1, -1):
+            is_next_text_char_digit[idx] = is_digit
+            if len(pieces[idx][2]) > 0:
+                is_digit = pieces[idx][2][:1].isdigit()
+
+        return is_next_text_char_digit
+
+    @staticmethod
+    def _emit_tokens(tokenized_pieces: list[TokenizedPiece], token_state: TokenState) -> tuple[list[str], TokenState]:
+        # note: the same as TextPreprocessor.join_tokenized_pieces, except that chars not flushed yet are carried in and out of the segment
+        is_processing_string, string_chars, name_chars = token_state
+        tokens: list[str] = []
+
+        for string_prefix, name_prefix, is_flushed, piece_tokens, is_processing_string, piece_string_chars, piece_name_chars in tokenized_pieces:
+            string_chars += string_prefix
+            name_chars += name_prefix
+            if not is_flushed:
+                continue
+
+            tokens.extend(Document._flush_tokens(string_chars, name_chars))
+            tokens.extend(piece_tokens)
+            string_chars = piece_string_chars
+            name_chars = piece_name_chars
+
+        return tokens, (is_processing_string, string_chars, name_chars)
+
+    @staticmethod
+    def _flush_tokens(string_chars: str, name_chars: str) -> list[str]:
+        return [chars for chars in [string_chars, name_chars] if len(chars) > 0]
+
+    @staticmethod
+    def _find_segment_start(root: Node, byte_idx: int) -> int:
+        # note: a segment starts at a top-level node and takes the text up to the next one, the first segment starts at the start of the source
+        cursor = Document._walk_to_top_level_node(root, byte_idx)
+        if cursor is None:
+            cursor = root.walk()
+            return cursor.node.start_byte if cursor.goto_last_child() else 0
+
+        if cursor.node.start_byte <= byte_idx:
+            return cursor.node.start_byte
+
+        return cursor.node.start_byte if cursor.goto_previous_sibling() else 0
+
+    @staticmethod
+    def _find_segment_end(root: Node, byte_idx: int, source_length: int) -> int:
+        cursor = Document._walk_to_top_level_node(root, byte_idx)
+        is_node = cursor is not None
+        while is_node and cursor.node.start_byte < byte_idx:
+            is_node = cursor.goto_next_sibling()
+
+        return min(cursor.node.start_byte, source_length) if is_node else source_length
+
+    @staticmethod
+    def _walk_to_top_level_node(root: Node, byte_idx: int) -> TreeCursor | None:
+        # note: returns a cursor at the first top-level node that ends after the byte, TreeCursor.goto_first_child_for_byte
+        # also stops at a node that ends at the byte and stays at the root when there is no such node
+        cursor = root.walk()
+        cursor.goto_first_child_for_byte(byte_idx)
+        is_node = cursor.depth > 0
+        while is_node and cursor.node.end_byte <= byte_idx:
+            is_node = cursor.goto_next_sibling()
+
+        return cursor if is_node else None
+
+    @staticmethod
+    def _edit_tree(tree: Tree, old_source: bytes, new_source: bytes, start_byte: int, old_end_byte: int, new_end_byte: int) -> None:
+        tree.edit(
+            start_byte=start_byte,
+            old_end_byte=old_end_byte,
+            new_end_byte=new_end_byte,
+            start_point=Document._byte_to_point(old_source, start_byte),
+            old_end_point=Document._byte_to_point(old_source, old_end_byte),
+            new_end_point=Document._byte_to_point(new_source, new_end_byte),
+        )
+
+    @staticmethod
+    def _byte_to_point(source: bytes, byte_idx: int) -> tuple[int, int]:
+        row = source.count(b'\n', 0, byte_idx)
+        column = byte_idx - (source.rfind(b'\n', 0, byte_idx) + 1)
+        return (row, column)
@@ -1,9 +1,11 @@
 import torch
 import torch.utils.data
 import os
+import time
 from hyperparameters import HYPERPARAMETERS
 from src.NeuralNetwork import NeuralNetwork
 from src.TextPreprocessor import TextPreprocessor
+from src.Document import Document
 
 class NextTokenPredictor:
     def __init__(self, neural_network: NeuralNetwork) -> None:
@@ -31,6 +33,7 @@ class NextTokenPredictor:
             epoch_perplexity = 0
             epoch_accuracy = 0
             epoch_number_of_examples = 0
+            epoch_start_time = time.perf_counter()
 
             for inputs, lengths, targets in train_set:
                 optimizer.zero_grad()
@@ -52,6 +55,8 @@ class NextTokenPredictor:
 
                     print(f'\tminibatch: train loss {minibatch_loss.item()}, train perplexity: {minibatch_perplexity}, train accuracy {minibatch_accuracy}')
 
+            epoch_time = time.perf_counter() - epoch_start_time
+
             print('\nevaluating...')
             epoch_val_perplexity, epoch_val_accuracy = self.eval(val_set)
             if epoch_val_perplexity < best_val_perplexity:
@@ -63,7 +68,7 @@ class NextTokenPredictor:
             epoch_perplexity = self._calculate_perplexity(torch.tensor(epoch_loss))
             epoch_accuracy /= epoch_number_of_examples
 
-            print(f'\nepoch {e + 1} — train loss: {epoch_loss}, train perplexity: {epoch_perplexity}, train accuracy {epoch_accuracy}, val perplexity: {epoch_val_perplexity}, val accuracy {epoch_val_accuracy} | BEST val perplexity {best_val_perplexity}, epoch {best_epoch + 1}\n')
+            print(f'\nepoch {e + 1} — train loss: {epoch_loss}, train perplexity: {epoch_perplexity}, train accuracy {epoch_accuracy}, val perplexity: {epoch_val_perplexity}, val accuracy {epoch_val_accuracy}, epoch time {epoch_time}s | BEST val perplexity {best_val_perplexity}, epoch {best_epoch + 1}\n')
 
     def eval(self, val_set: torch.utils.data.DataLoader) -> tuple[float, float]:
         with torch.no_grad():
@@ -96,11 +101,19 @@ class NextTokenPredictor:
         return perplexity, accuracy
     
     def predict(self, text: str) -> str:
+        tokens = TextPreprocessor.tokenize(text)
+        return " ".join(tokens + self._autocomplete(tokens))
+
+    def predict_document(self, document: Document, cursor_byte: int) -> str:
+        tokens = document.tokens_before(cursor_byte)
+        return " ".join(tokens + self._autocomplete(tokens))
+
+    def _autocomplete(self, tokens: list[str]) -> list[str]:
         with torch.no_grad():
             self.neural_network.eval()
 
-            tokens = TextPreprocessor.tokenize(text)
-
+            tokens = list(tokens)
+            autocompletion_tokens: list[str] = []
             next_token_idx = -1
             number_of_autocompletions = 0
 
@@ -117,13 +130,14 @@ class NextTokenPredictor:
                 next_token = self.neural_network.vocabulary.get_word(next_token_idx)
                 
                 tokens.append(next_token)
+                autocompletion_tokens.append(next_token)
 
                 if next_token == self.neural_network.vocabulary.end_of_sequence_token:
                     break
 
                 number_of_autocompletions += 1
 
-            return " ".join(tokens)
+            return autocompletion_tokens
 
     def _calculate_loss(self, As: torch.Tensor, Ys: torch.Tensor) -> torch.Tensor:
         return torch.nn.CrossEntropyLoss().forward(As.squeeze(), Ys.squeeze())
@@ -1,6 +1,19 @@
 import re
+import typing
 from tree_sitter import Language, Parser, Node, Tree
 
+# note: (start_byte, end_byte, normalized text, regex replacements that produced it)
+Piece = tuple[int, int, str, list[tuple[str, str]]]
+
+# note: (string prefix, name prefix, is flushed, tokens, is processing string, string chars, name chars), see tokenize_piece
+TokenizedPiece = tuple[str, str, bool, list[str], bool, str, str]
+
+# note: (entries of the previous split, entries used by this split) of class members, see split_class_into_pieces
+Cache = tuple[dict[tuple, typing.Any], dict[tuple, typing.Any]]
+
+# note: (indentation of the previous line, indentations of the open blocks) in front of a line, see scan_blocks
+BlockState = tuple[int, tuple[int, ...]]
+
 class TextPreprocessor:
     RE_STRING_TAGS = r'[\'\"\`]+'
     RE_NAME = r'[a-zA-Z0-9_]+'
@@ -15,6 +28,12 @@ class TextPreprocessor:
     RE_NEGATE_ALPHANUMERIC_AND_DOT = r'(?<![\w\.])'
     RE_WORD_BOUNDARY = r'\b'
 
+    RE_BLOCK_TOKENS = rb'^[ \t]*(?=\S)|`(?:[^`\\]|\\.)*`|\'(?:[^\'\\\n]|\\.)*\'|"(?:[^"\\\n]|\\.)*"|[{}`]'
+    WHITESPACE_BYTES = b' \t\r\n\f\v'
+
+    CLASS_TYPES = ['class_declaration']
+    FUNCTION_TYPES = ['function_declaration', 'function_signature', 'method_definition', 'method_signature']
+
     @staticmethod
     def preprocess(text: str) -> str:
         text = TextPreprocessor.clear_comments(text)
@@ -25,13 +44,19 @@ class TextPreprocessor:
     @staticmethod
     def tokenize(text: str) -> list[str]:
         text = TextPreprocessor.preprocess(text)
+        return TextPreprocessor.flush_tokenized_piece(TextPreprocessor.tokenize_piece(text))
 
+    @staticmethod
+    def tokenize_piece(text: str, is_processing_string: bool = False, next_text_char: str | None = None) -> TokenizedPiece:
+        # note: chars collected before the first flush are returned as prefixes, so that pieces can be tokenized separately and joined
         text_length = len(text)
         tokens: list[str] = []
 
-        is_processing_string = False
-        current_string_chars: list[str] = []
+        is_flushed = False
+        string_prefix = ''
+        name_prefix = ''
 
+        current_string_chars: list[str] = []
         current_name_chars: list[str] = []
 
         for i in range(0, text_length):
@@ -48,20 +73,26 @@ class TextPreprocessor:
             if re.match(TextPreprocessor.RE_NAME, char):
                 current_name_chars.append(char)
                 continue
-            
+
             # note: processing a floating point number, e.g., 3.14
-            next_char = text[i + 1] if i + 1 < text_length else None
+            next_char = text[i + 1] if i + 1 < text_length else next_text_char
             if char == '.' and next_char and re.match(TextPreprocessor.RE_NUMBER, next_char):
                 current_name_chars.append(char)
                 continue
 
-            if len(current_string_chars) > 0:
-                tokens.append("".join(current_string_chars))
-                current_string_chars = []
+            if not is_flushed:
+                is_flushed = True
+                string_prefix = "".join(current_string_chars)
+                name_prefix = "".join(current_name_chars)
+            else:
+                if len(current_string_chars) > 0:
+                    tokens.append("".join(current_string_chars))
 
-            if len(current_name_chars) > 0:
-                tokens.append("".join(current_name_chars))
-                current_name_chars = []
+                if len(current_name_chars) > 0:
+                    tokens.append("".join(current_name_chars))
+
+            current_string_chars = []
+            current_name_chars = []
 
             # note: not interested in spaces and linebreaks
             if re.match(TextPreprocessor.RE_SPACES_AND_LINEBREAKS, char):
@@ -69,16 +100,72 @@ class TextPreprocessor:
 
             tokens.append(char)
 
-        if len(current_string_chars) > 0:
-            tokens.append("".join(current_string_chars))
-            current_string_chars = []
+        if not is_flushed:
+            return "".join(current_string_chars), "".join(current_name_chars), False, tokens, is_processing_string, '', ''
 
-        if len(current_name_chars) > 0:
-            tokens.append("".join(current_name_chars))
-            current_name_chars = []
+        return string_prefix, name_prefix, True, tokens, is_processing_string, "".join(current_string_chars), "".join(current_name_chars)
+
+    @staticmethod
+    def join_tokenized_pieces(tokenized_pieces: list[TokenizedPiece]) -> TokenizedPiece:
+        tokens: list[str] = []
+
+        is_flushed = False
+        string_prefix = ''
+        name_prefix = ''
+        is_processing_string = False
+        string_chars = ''
+        name_chars = ''
+
+        for piece_string_prefix, piece_name_prefix, is_piece_flushed, piece_tokens, is_processing_string, piece_string_chars, piece_name_chars in tokenized_pieces:
+            if not is_flushed:
+                string_prefix += piece_string_prefix
+                name_prefix += piece_name_prefix
+            else:
+                string_chars += piece_string_prefix
+                name_chars += piece_name_prefix
+
+            if not is_piece_flushed:
+                continue
+
+            if is_flushed:
+                if len(string_chars) > 0:
+                    tokens.append(string_chars)
+
+                if len(name_chars) > 0:
+                    tokens.append(name_chars)
+
+            is_flushed = True
+            tokens.extend(piece_tokens)
+            string_chars = piece_string_chars
+            name_chars = piece_name_chars
+
+        return string_prefix, name_prefix, is_flushed, tokens, is_processing_string, string_chars, name_chars
+
+    @staticmethod
+    def flush_tokenized_piece(tokenized_piece: TokenizedPiece) -> list[str]:
+        string_prefix, name_prefix, is_flushed, piece_tokens, _, string_chars, name_chars = tokenized_piece
+        tokens: list[str] = []
+
+        if is_flushed:
+            if len(string_prefix) > 0:
+                tokens.append(string_prefix)
+
+            if len(name_prefix) > 0:
+                tokens.append(name_prefix)
+
+            tokens.extend(piece_tokens)
+        else:
+            string_chars = string_prefix
+            name_chars = name_prefix
+
+        if len(string_chars) > 0:
+            tokens.append(string_chars)
+
+        if len(name_chars) > 0:
+            tokens.append(name_chars)
 
         return tokens
-    
+
     @staticmethod
     def clear_comments(text: str) -> str:
         return re.sub(TextPreprocessor.RE_COMMENTS, '', text, flags=re.MULTILINE).strip()
@@ -86,144 +173,375 @@ class TextPreprocessor:
     @staticmethod
     def clear_imports(text: str) -> str:
         return re.sub(TextPreprocessor.RE_IMPORTS, '', text, flags=re.MULTILINE).strip()
-    
+
     @staticmethod
     def normalize_names(text: str) -> str:
-        text = TextPreprocessor._normalize_names_in_classes(text)
-        text = TextPreprocessor._normalize_names_in_functions_and_methods(text)
-        return text
-    
+        source = bytes(text, 'utf8')
+        tree = TextPreprocessor.extract_code_tree(source)
+
+        if tree.root_node.has_error:
+            tree = TextPreprocessor.extract_code_tree(TextPreprocessor.close_unclosed_blocks(source))
+
+        return "".join(piece[2] for piece in TextPreprocessor.split_into_pieces(tree, source))
+
     @staticmethod
-    def _normalize_names_in_classes(text: str) -> str:
-        tree = TextPreprocessor._extract_code_tree(text)
-        replacements: list[tuple[str, int, int]] = []
-        stack: list[Node] = [tree.root_node]
+    def close_unclosed_blocks(source: bytes) -> bytes:
+        recovered_source = bytearray(source)
+        for idx in TextPreprocessor.find_unclosed_block_ends(source):
+            recovered_source[idx] = ord('}')
 
-        while len(stack) > 0:
-            node = stack.pop()
+        return bytes(recovered_source)
 
-            if node.type == 'class_declaration':
-                class_text = TextPreprocessor._replace_names_in_class(node)
-                replacements.append((class_text, node.start_byte, node.end_byte))
+    @staticmethod
+    def find_unclosed_block_ends(source: bytes) -> list[int]:
+        block_ends: list[int] = []
+        for _, _, line_block_ends in TextPreprocessor.scan_blocks(source):
+            block_ends.extend(line_block_ends)
 
-            for child in reversed(node.children):
-                stack.append(child)
+        return sorted(block_ends)
 
-        # note: applying replacements from the end to the beginning to avoid offset issues
-        for replacement, startIdx, endIdx in reversed(replacements):
-            text = text[:startIdx] + replacement + text[endIdx:]
+    @staticmethod
+    def scan_blocks(source: bytes, start_byte: int = 0, state: BlockState = (0, ())) -> typing.Iterator[tuple[int, BlockState | None, list[int]]]:
+        # note: a block is considered unclosed when a line at its indentation (or less) appears before its closing brace,
+        # the closing brace is then put into the whitespace in front of that line instead of the end of the file;
+        # yields (start byte, state in front of it, block ends put in front of it) of every line, so that a scan can be resumed from any line,
+        # and backticks without a closing backtick with no state, since a backtick typed after them changes the scan up to it
+        indentation = state[0]
+        block_indentations = list(state[1])
+
+        for match in re.compile(TextPreprocessor.RE_BLOCK_TOKENS, flags=re.MULTILINE).finditer(source, start_byte):
+            token = match.group()
+
+            if token == b'{':
+                block_indentations.append(indentation)
+                continue
+
+            if token == b'}':
+                if len(block_indentations) > 0:
+                    block_indentations.pop()
+                continue
+
+            if token == b'`':
+                yield match.start(), None, []
+                continue
+
+            if len(token) > 0 and token[0] not in b' \t':
+                continue
+
+            line_state = (indentation, tuple(block_indentations))
+            indentation = len(token)
+            line_end = match.end()
+            is_closing_line = source[line_end:line_end + 1] == b'}'
+
+            number_of_unclosed_blocks = 0
+            while len(block_indentations) > 0 \
+                and (block_indentations[-1] > indentation or (block_indentations[-1] == indentation and not is_closing_line)):
+                block_indentations.pop()
+                number_of_unclosed_blocks += 1
+
+            block_ends: list[int] = []
+            idx = line_end - 1
+            while number_of_unclosed_blocks > 0 and idx >= 0 and source[idx] in TextPreprocessor.WHITESPACE_BYTES:
+                block_ends.append(idx)
+                number_of_unclosed_blocks -= 1
+                idx -= 1
+
+            yield match.start(), line_state, block_ends[::-1]
+
+    @staticmethod
+    def split_into_pieces(tree: Tree, source: bytes) -> list[Piece]:
+        pieces: list[Piece] = []
+        position = 0
+
+        for node in tree.root_node.children:
+            if node.start_byte > position:
+                pieces.append(TextPreprocessor.make_piece(source, position, node.start_byte, []))
+
+            pieces.extend(TextPreprocessor.split_node_into_pieces(node, source))
+            position = max(position, node.end_byte)
+
+        if len(source) > position:
+            pieces.append(TextPreprocessor.make_piece(source, position, len(source), []))
+
+        return pieces
+
+    @staticmethod
+    def split_node_into_pieces(node: Node, source: bytes, cache: Cache | None = None) -> list[Piece]:
+        pieces: list[Piece] = []
+
+        for start_byte, end_byte, unit in TextPreprocessor.split_by_units(node, TextPreprocessor.CLASS_TYPES + TextPreprocessor.FUNCTION_TYPES):
+            if unit is None:
+                pieces.append(TextPreprocessor.make_piece(source, start_byte, end_byte, []))
+            elif unit.type in TextPreprocessor.CLASS_TYPES:
+                pieces.extend(TextPreprocessor.split_class_into_pieces(unit, source, cache))
+            else:
+                pieces.append(TextPreprocessor.normalize_function(unit, source, None))
+
+        return pieces
+
+    @staticmethod
+    def split_class_into_pieces(node: Node, source: bytes, cache: Cache | None = None) -> list[Piece]:
+        # note: names are collected per class member, so that with a cache only the edited members have to be traversed again
+        body = node.child_by_field_name('body')
+        class_names: list[str] = []
+        property_names: list[str] = []
+
+        for child in node.children:
+            for member in body.children if body is not None and child == body else [child]:
+                member_class_names, member_property_names = TextPreprocessor._get_cached(cache, member, (), lambda: TextPreprocessor.collect_class_names(member))
+                class_names.extend(member_class_names)
+                property_names.extend(member_property_names)
+
+        name_to_replacement = TextPreprocessor.map_class_names(class_names, property_names)
+        replacements = TextPreprocessor.map_class_names_to_replacements(name_to_replacement)
+
+        if body is None:
+            return [TextPreprocessor.make_piece(source, node.start_byte, node.end_byte, replacements)]
+
+        # note: members are normalized again when their text or the names of their class have changed
+        name_to_replacement_key = repr(name_to_replacement)
+        pieces: list[Piece] = [TextPreprocessor.make_piece(source, node.start_byte, body.start_byte, replacements)]
+        position = body.start_byte
+
+        for member in body.children:
+            if member.start_byte > position:
+                pieces.append(TextPreprocessor.make_piece(source, position, member.start_byte, replacements))
+
+            member_pieces = TextPreprocessor._get_cached(cache, member, (source[member.start_byte:member.end_byte], name_to_replacement_key), lambda: TextPreprocessor.shift_pieces(
+                TextPreprocessor.split_class_member_into_pieces(member, source, name_to_replacement),
+                -member.start_byte,
+            ))
+
+            pieces.extend(TextPreprocessor.shift_pieces(member_pieces, member.start_byte))
+            position = max(position, member.end_byte)
+
+        if node.end_byte > position:
+            pieces.append(TextPreprocessor.make_piece(source, position, node.end_byte, replacements))
+
+        return pieces
+
+    @staticmethod
+    def split_class_member_into_pieces(node: Node, source: bytes, name_to_replacement: tuple[dict[str, str], dict[str, str]]) -> list[Piece]:
+        replacements = TextPreprocessor.map_class_names_to_replacements(name_to_replacement)
+        pieces: list[Piece] = []
+
+        for start_byte, end_byte, unit in TextPreprocessor.split_by_units(node, TextPreprocessor.FUNCTION_TYPES):
+            if unit is None:
+                pieces.append(TextPreprocessor.make_piece(source, start_byte, end_byte, replacements))
+            else:
+                pieces.append(TextPreprocessor.normalize_function(unit, source, name_to_replacement))
+
+        return pieces
 
-        return text
-    
     @staticmethod
-    def _normalize_names_in_functions_and_methods(text: str) -> str:
-        tree = TextPreprocessor._extract_code_tree(text)
-        replacements: list[tuple[str, int, int]] = []
-        stack: list[Node] = [tree.root_node]
+    def normalize_function(node: Node, source: bytes, class_name_to_replacement: tuple[dict[str, str], dict[str, str]] | None) -> Piece:
+        if class_name_to_replacement:
+            class_replacements = TextPreprocessor.map_class_names_to_replacements(class_name_to_replacement)
+            text = TextPreprocessor.apply_replacements(source[node.start_byte:node.end_byte].decode(), class_replacements)
+            property_name_to_replacement = class_name_to_replacement[1]
+        else:
+            # note: classes declared inside of a function are renamed before the function itself
+            class_replacements = []
+            text = "".join(
+                source[start_byte:end_byte].decode() if unit is None else TextPreprocessor._rename_names_in_class(unit, source)
+                for start_byte, end_byte, unit in TextPreprocessor.split_by_units(node, TextPreprocessor.CLASS_TYPES)
+            )
+            property_name_to_replacement = None
+
+        function_names, method_names, variable_names = TextPreprocessor.collect_function_names(node, property_name_to_replacement)
+        function_replacements = TextPreprocessor.map_function_names_to_replacements(function_names, method_names, variable_names)
+        text = TextPreprocessor.apply_replacements(text, function_replacements)
+
+        return node.start_byte, node.end_byte, text, class_replacements + function_replacements
+
+    @staticmethod
+    def collect_class_names(node: Node) -> tuple[list[str], list[str]]:
+        class_names: list[str] = []
+        property_names: list[str] = []
+
+        stack: list[Node] = [node]
 
         while len(stack) > 0:
             node = stack.pop()
 
-            if node.type in ['function_declaration', 'function_signature']:
-                function_text = TextPreprocessor._replace_names_in_functions_and_methods(node)
-                replacements.append((function_text, node.start_byte, node.end_byte))
+            if TextPreprocessor._is_class_name(node):
+                class_name = node.text.decode()
+                class_names.append(class_name)
 
-            if node.type in ['method_definition', 'method_signature']:
-                method_text = TextPreprocessor._replace_names_in_functions_and_methods(node)
-                replacements.append((method_text, node.start_byte, node.end_byte))
+            if TextPreprocessor._is_property_name(node):
+                property_name = node.text.decode()
+                property_names.append(property_name)
 
             for child in reversed(node.children):
                 stack.append(child)
 
-        # note: applying replacements from the end to the beginning to avoid offset issues
-        for replacement, startIdx, endIdx in reversed(replacements):
-            text = text[:startIdx] + replacement + text[endIdx:]
+        return class_names, property_names
+
+    @staticmethod
+    def map_class_names(class_names: list[str], property_names: list[str]) -> tuple[dict[str, str], dict[str, str]]:
+        class_name_to_replacement = TextPreprocessor._map_name_to_replacement(class_names, 'class')
+        property_name_to_replacement = TextPreprocessor._map_name_to_replacement_with_idx(property_names, 'property')
+        return class_name_to_replacement, property_name_to_replacement
 
-        return text
-    
     @staticmethod
-    def _replace_names_in_functions_and_methods(node: Node) -> str:
+    def collect_function_names(node: Node, property_name_to_replacement: dict[str, str] | None) -> tuple[list[str], list[str], list[str]]:
         function_names: list[str] = []
         method_names: list[str] = []
         variable_names: list[str] = []
 
-        root = node
-        stack: list[Node] = [root]
+        # note: names are collected as they look after renaming of the enclosing class
+        stack: list[tuple[Node, dict[str, str] | None]] = [(node, property_name_to_replacement)]
 
         while len(stack) > 0:
-            node = stack.pop()
+            node, property_name_to_replacement = stack.pop()
+
+            if property_name_to_replacement is None and node.type in TextPreprocessor.CLASS_TYPES:
+                property_name_to_replacement = TextPreprocessor.map_class_names(*TextPreprocessor.collect_class_names(node))[1]
 
             if TextPreprocessor._is_function_name(node):
-                function_name = node.text.decode()
-                function_names.append(function_name)
+                function_names.append(TextPreprocessor._rename(node, property_name_to_replacement))
 
             if TextPreprocessor._is_method_name(node):
-                method_name = node.text.decode()
-                method_names.append(method_name)
+                method_names.append(TextPreprocessor._rename(node, property_name_to_replacement))
 
             if TextPreprocessor._is_variable_name(node):
-                variable_name = node.text.decode()
-                variable_names.append(variable_name)
+                variable_names.append(TextPreprocessor._rename(node, property_name_to_replacement))
 
             for child in reversed(node.children):
-                stack.append(child)
-        
+                stack.append((child, property_name_to_replacement))
+
+        return function_names, method_names, variable_names
+
+    @staticmethod
+    def apply_replacements(text: str, replacements: list[tuple[str, str]]) -> str:
+        for pattern, replacement in replacements:
+            text = re.sub(pattern, replacement, text)
+
+        return text
+
+    @staticmethod
+    def map_class_names_to_replacements(name_to_replacement: tuple[dict[str, str], dict[str, str]]) -> list[tuple[str, str]]:
+        class_name_to_replacement, property_name_to_replacement = name_to_replacement
+        replacements: list[tuple[str, str]] = []
+
+        for class_name, replacement in class_name_to_replacement.items():
+            pattern = TextPreprocessor.RE_CLASS + re.escape(class_name) + TextPreprocessor.RE_WORD_BOUNDARY
+            replacements.append((pattern, r'\1' + replacement))
+
+        for property_name, replacement in property_name_to_replacement.items():
+            pattern = TextPreprocessor.RE_WORD_BOUNDARY + re.escape(property_name) + TextPreprocessor.RE_WORD_BOUNDARY
+            replacements.append((pattern, replacement))
+
+        return replacements
+
+    @staticmethod
+    def map_function_names_to_replacements(function_names: list[str], method_names: list[str], variable_names: list[str]) -> list[tuple[str, str]]:
         function_name_to_replacement = TextPreprocessor._map_name_to_replacement(function_names, 'function')
         method_name_to_replacement = TextPreprocessor._map_name_to_replacement(method_names, 'method')
         variable_name_to_replacement = TextPreprocessor._map_name_to_replacement_with_idx(variable_names, 'variable')
 
-        text = root.text.decode()
+        replacements: list[tuple[str, str]] = []
 
         for function_name, replacement in function_name_to_replacement.items():
             pattern = TextPreprocessor.RE_FUNCTION + re.escape(function_name) + TextPreprocessor.RE_WORD_BOUNDARY
-            text = re.sub(pattern, r'\1\2' + replacement, text)
+            replacements.append((pattern, r'\1\2' + replacement))
 
         for method_name, replacement in method_name_to_replacement.items():
             pattern = TextPreprocessor.RE_METHOD + re.escape(method_name) + TextPreprocessor.RE_WORD_BOUNDARY
-            text = re.sub(pattern, r'\1\2' + replacement, text)
+            replacements.append((pattern, r'\1\2' + replacement))
 
         for variable_name, replacement in variable_name_to_replacement.items():
             pattern = TextPreprocessor.RE_NEGATE_ALPHANUMERIC_AND_DOT + re.escape(variable_name) + TextPreprocessor.RE_WORD_BOUNDARY
-            text = re.sub(pattern, replacement, text)
+            replacements.append((pattern, replacement))
+
+        return replacements
 
-        return text
-    
     @staticmethod
-    def _replace_names_in_class(node: Node) -> str:
-        class_names: list[str] = []
-        property_names: list[str] = []
+    def split_by_units(node: Node, unit_types: list[str]) -> list[tuple[int, int, Node | None]]:
+        # note: only the outermost units are returned, the text between them is returned with None instead of a unit
+        if node.type in unit_types:
+            return [(node.start_byte, node.end_byte, node)]
 
-        root = node
-        stack: list[Node] = [root]
+        segments: list[tuple[int, int, Node | None]] = []
+        position = node.start_byte
+        stack: list[Node] = list(reversed(node.children))
 
         while len(stack) > 0:
-            node = stack.pop()
+            child = stack.pop()
 
-            if TextPreprocessor._is_class_name(node):
-                class_name = node.text.decode()
-                class_names.append(class_name)
+            if child.type not in unit_types:
+                for grandchild in reversed(child.children):
+                    stack.append(grandchild)
+                continue
 
-            if TextPreprocessor._is_property_name(node):
-                property_name = node.text.decode()
-                property_names.append(property_name)
+            if child.start_byte > position:
+                segments.append((position, child.start_byte, None))
 
-            for child in reversed(node.children):
-                stack.append(child)
+            segments.append((child.start_byte, child.end_byte, child))
+            position = child.end_byte
 
-        class_name_to_replacement = TextPreprocessor._map_name_to_replacement(class_names, 'class')
-        property_name_to_replacement = TextPreprocessor._map_name_to_replacement_with_idx(property_names, 'property')
+        if node.end_byte > position:
+            segments.append((position, node.end_byte, None))
 
-        text = root.text.decode()
+        return segments
 
-        for class_name, replacement in class_name_to_replacement.items():
-            pattern = TextPreprocessor.RE_CLASS + re.escape(class_name) + TextPreprocessor.RE_WORD_BOUNDARY
-            text = re.sub(pattern, r'\1' + replacement, text)
+    @staticmethod
+    def make_piece(source: bytes, start_byte: int, end_byte: int, replacements: list[tuple[str, str]]) -> Piece:
+        text = source[start_byte:end_byte].decode()
 
-        for property_name, replacement in property_name_to_replacement.items():
-            pattern = TextPreprocessor.RE_WORD_BOUNDARY + re.escape(property_name) + TextPreprocessor.RE_WORD_BOUNDARY
-            text = re.sub(pattern, replacement, text)
+        # note: every replacement needs a name to match, so whitespace is never replaced
+        if text.isspace():
+            return start_byte, end_byte, text, replacements
 
-        return text
+        return start_byte, end_byte, TextPreprocessor.apply_replacements(text, replacements), replacements
+
+    @staticmethod
+    def shift_pieces(pieces: list[Piece], delta: int) -> list[Piece]:
+        return [(start_byte + delta, end_byte + delta, text, replacements) for start_byte, end_byte, text, replacements in pieces]
+
+    @staticmethod
+    def extract_code_tree(source: bytes) -> Tree:
+        code_parser = Parser()
+        code_parser.set_language(TextPreprocessor.load_typescript_language())
+        tree = code_parser.parse(source)
+        return tree
+
+    @staticmethod
+    def load_typescript_language() -> Language:
+        Language.build_library('build/my-languages.so', ['tree-sitter-typescript/typescript'])
+        return Language('build/my-languages.so', 'typescript')
+
+    @staticmethod
+    def _rename(node: Node, property_name_to_replacement: dict[str, str] | None) -> str:
+        name = node.text.decode()
+        if property_name_to_replacement and name in property_name_to_replacement:
+            return property_name_to_replacement[name]
+
+        return name
+
+    @staticmethod
+    def _rename_names_in_class(node: Node, source: bytes) -> str:
+        name_to_replacement = TextPreprocessor.map_class_names(*TextPreprocessor.collect_class_names(node))
+        replacements = TextPreprocessor.map_class_names_to_replacements(name_to_replacement)
+        return TextPreprocessor.apply_replacements(source[node.start_byte:node.end_byte].decode(), replacements)
+
+    @staticmethod
+    def _get_cached(cache: Cache | None, node: Node, key: tuple, compute: typing.Callable[[], typing.Any]) -> typing.Any:
+        # note: the same text can be parsed differently while it has errors, so nodes with errors are never cached
+        if cache is None or node.has_error:
+            return compute()
+
+        previous_cache, used_cache = cache
+        key = (node.type, node.text) + key
+
+        value = used_cache.get(key)
+        if value is None:
+            value = previous_cache.get(key)
+        if value is None:
+            value = compute()
+
+        used_cache[key] = value
+        return value
 
     @staticmethod
     def _is_variable_name(node: Node) -> bool | None:
@@ -264,16 +582,4 @@ class TextPreprocessor:
         for idx, name in enumerate(names):
             name_to_replacement[name] = f'_{tag}{idx}_'
 
-        return name_to_replacement
-    
-    @staticmethod
-    def _extract_code_tree(text: str) -> Tree:
-        code_parser = Parser()
-        code_parser.set_language(TextPreprocessor._load_typescript_language())
-        tree = code_parser.parse(bytes(text, "utf8"))
-        return tree
-
-    @staticmethod
-    def _load_typescript_language() -> Language:
-        Language.build_library('build/my-languages.so', ['tree-sitter-typescript/typescript'])
-        return Language('build/my-languages.so', 'typescript')
\ No newline at end of file
+        return name_to_replacement
\ No newline at end of file
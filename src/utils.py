@@ -1,5 +1,12 @@
 import torch.utils.data
+import os
+import time
+import numpy as np
+from tree_sitter import Node
 from src.NextTokenPredictor import NextTokenPredictor
+from src.TextPreprocessor import TextPreprocessor
+from src.Document import Document
+from src.Deduplicator import Deduplicator
 
 def test(next_token_predictor: NextTokenPredictor, test_set: torch.utils.data.DataLoader) -> None:
     test_perplexity, test_accuracy = next_token_predictor.eval(test_set)
@@ -15,5 +22,116 @@ def demonstrate_examples(next_token_predictor: NextTokenPredictor) -> None:
 
     print('\n------')
     for idx, original_text in enumerate(original_texts):
-        autocompleted_text = next_token_predictor.predict(original_text)
-        print(f'\nEXAMPLE {idx + 1}:\n🙋: {original_text}\n🤖: {autocompleted_text}')
\ No newline at end of file
+        # note: the examples are autocompleted as open files with the cursor at the end, the same way as an editor would do it
+        document = Document(original_text)
+        autocompleted_text = next_token_predictor.predict_document(document, len(document.source))
+        print(f'\nEXAMPLE {idx + 1}:\n🙋: {original_text}\n🤖: {autocompleted_text}')
+
+def report_deduplication(deduplicator: Deduplicator) -> None:
+    number_of_removed_examples = deduplicator.number_of_exact_duplicates + deduplicator.number_of_near_duplicate_examples
+    removed_share = number_of_removed_examples / max(deduplicator.number_of_examples, 1) * 100
+
+    print('\n------')
+    print(f'\nDEDUPLICATION RESULTS:\nexamples — {deduplicator.number_of_examples}\nexact duplicates removed (approximate) — {deduplicator.number_of_exact_duplicates}')
+    print(f'expected bloom filter false positive rate — {deduplicator.calculate_false_positive_rate()}')
+    print(f'near-duplicate files removed — {deduplicator.number_of_near_duplicate_files} of {deduplicator.number_of_files} ({deduplicator.number_of_near_duplicate_examples} examples)')
+    print(f'total removed — {number_of_removed_examples} ({removed_share}%)')
+
+def benchmark_incremental_preprocessing(number_of_copies: int = 8) -> None:
+    texts: list[str] = []
+    for folder in [os.path.join('dataset', 'train'), os.path.join('dataset', 'val'), os.path.join('dataset', 'test')]:
+        for filename in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, filename)) as file:
+                texts.append(file.read())
+
+    # note: a large file is built by repeating the dataset sources, a new function is typed in the middle of it
+    head = '\n'.join(texts * (number_of_copies // 2)) + '\n'
+    tail = '\n' + '\n'.join(texts * (number_of_copies - number_of_copies // 2))
+    keystrokes = 'export function _function_<T>(array: T[]): T {\n    const first = array[0];\n    return first;\n}\n'
+    _replay_keystrokes('new function between classes', head, tail, keystrokes)
+
+    # note: a large class is built by repeating the members of the dataset classes, a statement is typed into the body of a method in the middle of it
+    members: list[str] = []
+    for text in texts:
+        source = bytes(text, 'utf8')
+        for class_body in _find_class_bodies(source):
+            members.append(source[class_body.start_byte + 1:class_body.end_byte - 1].decode())
+
+    class_source = bytes('export class _class_<T = any> {' + '\n'.join(members * number_of_copies) + '}\n', 'utf8')
+    methods = [node for node in _find_class_bodies(class_source)[0].children if node.type == 'method_definition']
+    method_body = methods[len(methods) // 2].child_by_field_name('body')
+
+    head = class_source[:method_body.start_byte + 1].decode()
+    tail = class_source[method_body.start_byte + 1:].decode()
+    keystrokes = '\n        const first = this.items[0];\n        if (first) {\n            return first;\n        }'
+    _replay_keystrokes('statement in a method of a large class', head, tail, keystrokes)
+
+    # note: random snippets are inserted into and random spans are deleted from the dataset sources, which reaches states that typing in order does not
+    _replay_random_edits('random edits of the dataset sources', '\n'.join(texts), 200)
+
+def _replay_keystrokes(name: str, head: str, tail: str, keystrokes: str) -> None:
+    document = Document(head + tail)
+    byte_idx = len(bytes(head, 'utf8'))
+
+    full_reparse_times: list[float] = []
+    incremental_reparse_times: list[float] = []
+    number_of_mismatches = 0
+
+    for char in keystrokes:
+        start_time = time.perf_counter()
+        document.insert(byte_idx, char)
+        incremental_reparse_times.append(time.perf_counter() - start_time)
+        byte_idx += len(bytes(char, 'utf8'))
+
+        start_time = time.perf_counter()
+        full_reparse_tokens = TextPreprocessor.tokenize(document.text)
+        full_reparse_times.append(time.perf_counter() - start_time)
+
+        if document.tokens != full_reparse_tokens:
+            number_of_mismatches += 1
+
+    print('\n------')
+    print(f'\nKEYSTROKE REPLAY RESULTS ({name}):\nfile size — {len(document.text)} chars, {len(document.tokens)} tokens\nkeystrokes — {len(keystrokes)}')
+    print(f'full reparse — {_format_times(full_reparse_times)}')
+    print(f'incremental reparse — {_format_times(incremental_reparse_times)}')
+    print(f'keystrokes with mismatching token streams — {number_of_mismatches}')
+
+def _replay_random_edits(name: str, text: str, number_of_edits: int) -> None:
+    snippets = ['', '', '{', '}', '(', ')', '[', ']', '<', '>', '`', "'", '"', '/*', '*/', '// ', '\n', '    ', ';', 'export ', 'import _a from "_b";\n',
+                'class _A {', 'function _f() {', 'const _a = 1;\n', '${', '0']
+    generator = np.random.default_rng(seed=0)
+    document = Document(text)
+
+    incremental_reparse_times: list[float] = []
+    number_of_mismatches = 0
+
+    for _ in range(number_of_edits):
+        text = document.text
+        start_idx = int(generator.integers(len(text) + 1))
+        end_idx = min(start_idx + int(generator.choice([0, 0, 1, 3, 40])), len(text))
+        start_byte = len(bytes(text[:start_idx], 'utf8'))
+        end_byte = start_byte + len(bytes(text[start_idx:end_idx], 'utf8'))
+
+        start_time = time.perf_counter()
+        document.edit(start_byte, end_byte, str(generator.choice(snippets)))
+        incremental_reparse_times.append(time.perf_counter() - start_time)
+
+        if document.tokens != TextPreprocessor.tokenize(document.text):
+            number_of_mismatches += 1
+
+    print('\n------')
+    print(f'\nRANDOM EDIT REPLAY RESULTS ({name}):\nfile size — {len(document.text)} chars, {len(document.tokens)} tokens\nedits — {number_of_edits}')
+    print(f'incremental reparse — {_format_times(incremental_reparse_times, "edit")}')
+    print(f'edits with mismatching token streams — {number_of_mismatches}')
+
+def _find_class_bodies(source: bytes) -> list[Node]:
+    class_bodies: list[Node] = []
+    for _, _, unit in TextPreprocessor.split_by_units(TextPreprocessor.extract_code_tree(source).root_node, TextPreprocessor.CLASS_TYPES):
+        if unit is not None and unit.child_by_field_name('body') is not None:
+            class_bodies.append(unit.child_by_field_name('body'))
+
+    return class_bodies
+
+def _format_times(times: list[float], unit: str = 'keystroke') -> str:
+    p50, p95, p100 = np.percentile(np.array(times) * 1000, [50, 95, 100])
+    return f'p50 {p50:.1f} ms, p95 {p95:.1f} ms, max {p100:.1f} ms per {unit}'